@@ -10,13 +10,21 @@ A complete graphical chess game where you can play against Stockfish
 import tkinter as tk
 from tkinter import messagebox, filedialog, scrolledtext
 import tkinter.ttk as ttk
+import tkinter.font as tkfont
 import chess
 import chess.engine
 import chess.pgn
+import chess.polyglot
 import os
 import sys
+import shutil
 import threading
+import heapq
 import json
+import signal
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from datetime import datetime
 
 
@@ -29,12 +37,72 @@ WINDOW_WIDTH = 1280
 WINDOW_HEIGHT = 720
 SQUARE_SIZE = 72
 
+# Settings, cache and a bundled Stockfish live next to this file
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Range and step of the AI speed (seconds per move) spinbox
+AI_SPEED_SPINBOX = {'from_': 0.1, 'to': 10.0, 'increment': 0.5, 'width': 8}
+
+# Button rows as (text, method name), looked up on the instance when built
+CONTROL_BUTTONS = (
+    ("New Game", "new_game"),
+    ("Undo", "undo_move"),
+    ("Hint", "toggle_hint"),
+    ("Flip Board", "flip_board"),
+)
+ANALYSIS_BUTTONS = (
+    ("Analyze", "analyze_position"),
+    ("Review Game", "open_game_review"),
+    ("Find Blunders", "find_blunders"),
+)
+ACTION_BUTTONS = (
+    ("Save PGN", "save_game"),
+    ("Load PGN", "load_game"),
+    ("Accounts", "open_accounts"),
+)
+
+# Analysis cache (positions kept across sessions)
+ANALYSIS_CACHE_SIZE = 20000
+
+# Read/write buffer for PGN and analysis cache files
+FILE_BUFFER_SIZE = 4 * 1024 * 1024
+
+# Delay (ms) before settings are written, so rapid changes cost one write
+SETTINGS_SAVE_DELAY = 500
+
+# Engine defaults, leave one core free for the UI. Machine specific, so they
+# are only written to the shared settings file once the user changes them
+DEFAULT_ENGINE_THREADS = max(1, (os.cpu_count() or 1) - 1)
+DEFAULT_ENGINE_HASH = 256
+
+# Extra single-threaded engines used for blunder analysis
+ENGINE_POOL_SIZE = min(os.cpu_count() or 1, 4)
+
+# Fixed search depth for blunder analysis, reproducible across runs
+BLUNDER_DEPTH = 12
+
+# Search depth for hints, a cached analysis this deep is shown without searching
+HINT_DEPTH = 14
+
+# Evaluation loss (centipawns) above which a move is reported as a blunder
+CP_BLUNDER = 50
+
+# Centipawn value of a forced mate, mate in n scores MATE_SCORE - n
+MATE_SCORE = 10000
+
 # Unicode chess pieces
 PIECES = {
     'P': '♙', 'R': '♖', 'N': '♘', 'B': '♗', 'Q': '♕', 'K': '♔',
     'p': '♟', 'r': '♜', 'n': '♞', 'b': '♝', 'q': '♛', 'k': '♚'
 }
 
+# Glyphs indexed by (color << 3) | piece_type, skips building piece symbols
+PIECE_GLYPHS = [None] * 16
+for _symbol, _glyph in PIECES.items():
+    _piece = chess.Piece.from_symbol(_symbol)
+    PIECE_GLYPHS[(_piece.color << 3) | _piece.piece_type] = _glyph
+del _symbol, _glyph, _piece
+
 # Color themes
 THEMES = {
     'Classic': {
@@ -63,6 +131,14 @@ THEMES = {
     }
 }
 
+# Board colors per theme, unpacked in one step by draw_board
+THEME_COLORS = {
+    name: (theme['light'], theme['dark'], theme['select'], theme['highlight'],
+           theme['last_move'], theme['hint'], theme['white_piece'], theme['black_piece'],
+           theme['coord'])
+    for name, theme in THEMES.items()
+}
+
 
 # =============================================================================
 # SECTION 3: MAIN CHESSY CLASS
@@ -81,12 +157,27 @@ class Chessy:
         # Game state
         self.board = chess.Board()
         self.move_history = []
+        self.move_san = []
+        self.position_keys = [chess.polyglot.zobrist_hash(self.board)]
+        self.replay_board = chess.Board()
         self.engine = None
-        self.engine_lock = threading.Lock()
+        self.engine_path = None
+        self.engine_pool = []
+        self.review_engine = None
+        self.engines = ExitStack()
+        self.current_search = None
+        self.search_id = 0
+        self.closing = False
+        
+        # Single-thread executors: one is the only thread that talks to the
+        # main engine, the other runs batch analysis on the pool engines
+        self.engine_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chessy-engine")
+        self.analysis_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chessy-analysis")
+        self.pending_tasks = {}
         
         # UI state
         self.selected_square = None
-        self.legal_moves_list = []
+        self.legal_moves_list = frozenset()
         self.last_move = None
         self.hint_move = None
         self.show_hint = False
@@ -100,29 +191,71 @@ class Chessy:
         self.current_theme = 'Classic'
         self.board_flipped = False
         
+        # Square index for each board cell in screen order (row-major from
+        # the top-left), one table per orientation
+        self.square_lut = {
+            False: bytes(8 * (7 - rank) + file for rank in range(8) for file in range(8)),
+            True: bytes(8 * rank + (7 - file) for rank in range(8) for file in range(8)),
+        }
+        
+        # Engine settings
+        self.engine_threads = DEFAULT_ENGINE_THREADS
+        self.engine_hash = DEFAULT_ENGINE_HASH
+        self.stockfish_path = None
+        
         # Analysis/Review state
         self.review_mode = False
         self.review_board = None
         self.review_moves = []
         self.review_index = 0
-        self.analysis_cache = {}
+        self.analysis_cache = OrderedDict()
+        # Guards the cache, which the Tk, engine and pool threads all use
+        self.cache_lock = threading.Lock()
+        self.analysis_cache_loaded = False
         self.current_evaluation = 0.0
         
         # Settings storage
-        self.settings_file = 'chess_settings.json'
+        self.settings_file = os.path.join(APP_DIR, 'chess_settings.json')
+        self.saved_settings = None
+        self.settings_save_id = None
+        self.analysis_cache_file = os.path.join(APP_DIR, 'analysis_cache.json')
+        self.stockfish_path_file = os.path.join(APP_DIR, 'stockfish_path.txt')
         self.lichess_username = ""
         self.chesscom_username = ""
         
         # UI widgets
         self.canvas = None
+        self.piece_font = None
+        self.coord_font = None
+        self.body_font = None
+        self.bold_font = None
+        self.square_items = []
+        self.piece_items = []
+        self.square_state = []
+        self.coord_color = None
+        self.rank_labels = []
+        self.file_labels = []
+        self.coords_flipped = None
         self.status_label = None
+        self.status_text = None
+        self.analysis_frame = None
+        self.action_frame = None
         self.move_list_text = None
+        self.moves_shown = 0
         
-        # Initialize
-        self.load_settings()
-        self.load_stockfish()
-        self.create_ui()
-        self.draw_board()
+        # Initialize, shutting down any started engine if setup fails
+        try:
+            self.load_settings()
+            # Read off the main thread so a large cache doesn't delay the window.
+            # Started once the main loop runs, the worker hands its result back
+            # with root.after, which threaded Tcl refuses before mainloop()
+            self.root.after_idle(self.analysis_executor.submit, self.load_analysis_cache)
+            self.load_stockfish()
+            self.create_ui()
+            self.draw_board()
+        except BaseException:
+            self.engines.close()
+            raise
         
         print("✓ Chessy initialized")
     
@@ -135,17 +268,28 @@ class Chessy:
         try:
             if os.path.exists(self.settings_file):
                 with open(self.settings_file, 'r') as f:
-                    settings = json.load(f)
+                    # Kept to skip writing back an unchanged file
+                    self.saved_settings = f.read()
+                    settings = json.loads(self.saved_settings)
                     self.lichess_username = settings.get('lichess_username', '')
                     self.chesscom_username = settings.get('chesscom_username', '')
                     self.current_theme = settings.get('theme', 'Classic')
                     self.ai_difficulty = float(settings.get('ai_difficulty', 1.0))
+                    self.engine_threads = int(settings.get('engine_threads', self.engine_threads))
+                    self.engine_hash = int(settings.get('engine_hash', self.engine_hash))
                     print(f"✓ Settings loaded")
         except Exception as e:
             print(f"⚠ Error loading settings: {e}")
     
     def save_settings(self):
-        """Save settings to JSON file"""
+        """Save settings to JSON file, batching changes made in quick succession"""
+        if self.settings_save_id:
+            self.root.after_cancel(self.settings_save_id)
+        self.settings_save_id = self.root.after(SETTINGS_SAVE_DELAY, self.write_settings)
+    
+    def write_settings(self):
+        """Write settings to JSON file if they changed since the last write"""
+        self.settings_save_id = None
         try:
             settings = {
                 'lichess_username': self.lichess_username,
@@ -153,12 +297,92 @@ class Chessy:
                 'theme': self.current_theme,
                 'ai_difficulty': self.ai_difficulty
             }
+            if self.engine_threads != DEFAULT_ENGINE_THREADS:
+                settings['engine_threads'] = self.engine_threads
+            if self.engine_hash != DEFAULT_ENGINE_HASH:
+                settings['engine_hash'] = self.engine_hash
+            payload = json.dumps(settings, indent=2)
+            if payload == self.saved_settings:
+                return
             with open(self.settings_file, 'w') as f:
-                json.dump(settings, f, indent=2)
+                f.write(payload)
+            self.saved_settings = payload
             print(f"✓ Settings saved")
         except Exception as e:
             print(f"⚠ Error saving settings: {e}")
     
+    def load_stockfish_path(self):
+        """Read the Stockfish path found on an earlier launch on this machine"""
+        try:
+            with open(self.stockfish_path_file, 'r') as f:
+                self.stockfish_path = f.read().strip() or None
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"⚠ Error loading Stockfish path: {e}")
+    
+    def save_stockfish_path(self):
+        """Remember the Stockfish path in an untracked, per-machine file"""
+        try:
+            with open(self.stockfish_path_file, 'w') as f:
+                f.write(self.stockfish_path)
+        except OSError as e:
+            print(f"⚠ Error saving Stockfish path: {e}")
+    
+    def load_analysis_cache(self):
+        """Read cached engine analysis from JSON file (runs on the analysis thread)"""
+        loaded = OrderedDict()
+        try:
+            if os.path.exists(self.analysis_cache_file):
+                with open(self.analysis_cache_file, 'r', buffering=FILE_BUFFER_SIZE) as f:
+                    entries = json.load(f)
+                for key, (time_limit, depth, turn, kind, value, best) in entries.items():
+                    score = chess.engine.Cp(value) if kind == 'cp' else chess.engine.Mate(value)
+                    loaded[int(key)] = {
+                        'time': time_limit,
+                        'depth': depth,
+                        'score': chess.engine.PovScore(score, turn),
+                        'pv': [chess.Move.from_uci(best)] if best else []
+                    }
+        except Exception as e:
+            print(f"⚠ Error loading analysis cache: {e}")
+        self.ui(self.merge_analysis_cache, loaded)
+    
+    def merge_analysis_cache(self, loaded):
+        """Add the loaded analysis behind the positions searched this session"""
+        cache = self.analysis_cache
+        with self.cache_lock:
+            for key in reversed(loaded):
+                if key not in cache:
+                    cache[key] = loaded[key]
+                    cache.move_to_end(key, last=False)
+            while len(cache) > ANALYSIS_CACHE_SIZE:
+                cache.popitem(last=False)
+        self.analysis_cache_loaded = True
+        print(f"✓ Analysis cache loaded ({len(loaded)} positions)")
+    
+    def save_analysis_cache(self):
+        """Save cached engine analysis to JSON file"""
+        # Writing before the load finished would throw away the saved positions
+        if not self.analysis_cache_loaded:
+            return
+        try:
+            entries = {}
+            with self.cache_lock:
+                items = list(self.analysis_cache.items())
+            for key, entry in items:
+                pov = entry['score']
+                score = pov.relative
+                kind, value = ('mate', score.mate()) if score.is_mate() else ('cp', score.score())
+                # Lookups only need the best move, not the whole line
+                best = entry['pv'][0].uci() if entry['pv'] else ''
+                entries[key] = [entry['time'], entry['depth'], pov.turn, kind, value, best]
+            with open(self.analysis_cache_file, 'w', buffering=FILE_BUFFER_SIZE) as f:
+                json.dump(entries, f)
+            print(f"✓ Analysis cache saved ({len(entries)} positions)")
+        except Exception as e:
+            print(f"⚠ Error saving analysis cache: {e}")
+    
     # =========================================================================
     # SECTION 5: STOCKFISH ENGINE
     # =========================================================================
@@ -166,27 +390,37 @@ class Chessy:
     def load_stockfish(self):
         """Load Stockfish chess engine"""
         paths = [
-            os.path.join('stockfish', 'stockfish-windows-x86-64-avx2.exe'),
-            os.path.join('stockfish', 'stockfish.exe'),
-            'stockfish.exe',
-            'stockfish',
+            os.path.join(APP_DIR, 'stockfish', 'stockfish-windows-x86-64-avx2.exe'),
+            os.path.join(APP_DIR, 'stockfish', 'stockfish.exe'),
+            os.path.join(APP_DIR, 'stockfish.exe'),
+            os.path.join(APP_DIR, 'stockfish'),
             '/usr/bin/stockfish',
             '/usr/local/bin/stockfish',
         ]
         
         found = None
-        for path in paths:
-            if os.path.exists(path):
-                found = path
-                break
-            elif path in ['stockfish', 'stockfish.exe']:
-                found = path
-                break
+        self.load_stockfish_path()
+        if self.stockfish_path and os.path.isfile(self.stockfish_path):
+            # Resolved on an earlier launch, skip the probe
+            found = self.stockfish_path
+        else:
+            for path in paths:
+                if os.path.isfile(path):
+                    found = os.path.abspath(path)
+                    break
+            else:
+                found = shutil.which('stockfish') or shutil.which('stockfish.exe')
         
         if found:
             try:
                 self.engine = chess.engine.SimpleEngine.popen_uci(found)
+                self.engines.callback(self.quit_engine, self.engine)
+                self.engine_path = found
                 print(f"✓ Stockfish loaded: {found}")
+                self.configure_engine()
+                if found != self.stockfish_path:
+                    self.stockfish_path = found
+                    self.save_stockfish_path()
             except Exception as e:
                 print(f"✗ Stockfish error: {e}")
                 messagebox.showwarning("Stockfish Error", f"Could not load Stockfish:\n{e}")
@@ -197,6 +431,172 @@ class Chessy:
                 "Stockfish not detected.\nDownload from: https://stockfishchess.org/download/"
             )
     
+    def configure_engine(self, engine=None):
+        """Apply the Threads and Hash settings to the main or a given engine"""
+        engine = engine or self.engine
+        try:
+            # Clamp to the limits the engine reports, skip options it lacks
+            options = engine.options
+            config = {
+                name: min(value, options[name].max)
+                for name, value in (("Threads", self.engine_threads), ("Hash", self.engine_hash))
+                if name in options
+            }
+            engine.configure(config)
+            print(f"✓ Engine configured: {config}")
+        except chess.engine.EngineError as e:
+            print(f"⚠ Error configuring engine: {e}")
+    
+    def run_task(self, kind, task):
+        """Run one engine task, logging its errors"""
+        try:
+            task()
+        except Exception as e:
+            print(f"{kind} task error: {e}")
+    
+    def queue_task(self, kind, task):
+        """Queue a task for the engine thread, replacing a pending task of the same kind"""
+        pending = self.pending_tasks.get(kind)
+        if pending:
+            pending.cancel()
+        self.pending_tasks[kind] = self.engine_executor.submit(self.run_task, kind, task)
+    
+    def ui(self, fn, *args):
+        """Run a widget-touching call on the Tk main thread"""
+        self.root.after(0, fn, *args)
+    
+    def submit_analysis(self, title, job, win, *args):
+        """Run a window's job on the analysis thread, reporting a crash in that window"""
+        def done(future):
+            if future.cancelled() or self.closing:
+                return
+            error = future.exception()
+            if error:
+                print(f"⚠ {title} failed: {error}")
+                self.ui(self.analysis_failed, win, title, f"{title} failed:\n{error}")
+        self.analysis_executor.submit(job, win, *args).add_done_callback(done)
+    
+    def analysis_failed(self, win, title, message):
+        """Close an analysis window and report why its job stopped"""
+        if win.winfo_exists():
+            win.destroy()
+        messagebox.showerror(title, message)
+    
+    def get_engine_pool(self):
+        """Start the extra engines used for batch analysis on first use"""
+        while len(self.engine_pool) < ENGINE_POOL_SIZE:
+            self.engine_pool.append(self.start_pool_engine())
+        return self.engine_pool
+    
+    def get_review_engine(self):
+        """Start the full-strength engine used for game reviews on first use"""
+        if not self.review_engine:
+            engine = chess.engine.SimpleEngine.popen_uci(self.engine_path)
+            self.engines.callback(self.quit_engine, engine)
+            self.review_engine = engine
+        # Reapplied each review so changed settings take effect
+        self.configure_engine(self.review_engine)
+        return self.review_engine
+    
+    def start_pool_engine(self):
+        """Launch one batch-analysis engine"""
+        engine = chess.engine.SimpleEngine.popen_uci(self.engine_path)
+        self.engines.callback(self.quit_engine, engine)
+        # One search thread each so the pool doesn't oversubscribe the CPU,
+        # and enough hash to carry a chunk of plies
+        engine.configure({"Threads": 1, "Hash": 64})
+        return engine
+    
+    def quit_engine(self, engine):
+        """Shut down an engine process, ignoring one that already died"""
+        try:
+            engine.quit()
+        except chess.engine.EngineError:
+            pass
+    
+    def close(self):
+        """Stop searches, save the analysis cache and shut down all engines"""
+        self.closing = True
+        if self.settings_save_id:
+            # The main loop is gone, write the pending change right away
+            self.write_settings()
+        self.cancel_search()
+        self.engine_executor.shutdown(wait=False, cancel_futures=True)
+        self.analysis_executor.shutdown(wait=False, cancel_futures=True)
+        self.save_analysis_cache()
+        self.engines.close()
+    
+    def restart_pool_engine(self, engine):
+        """Replace a pool engine whose process has died"""
+        new_engine = self.start_pool_engine()
+        self.engine_pool[self.engine_pool.index(engine)] = new_engine
+        return new_engine
+    
+    def search(self, board, limit, key=None):
+        """Run a cancellable engine search, returns the final info dict"""
+        with self.engine.analysis(board, limit) as analysis:
+            self.current_search = analysis
+            try:
+                analysis.wait()
+                info = analysis.info
+            finally:
+                self.current_search = None
+        
+        # A stopped search may end early, so it is only cached by the depth it reached
+        if key is not None and "score" in info:
+            self.store_analysis(key, chess.engine.Limit(), info)
+        return info
+    
+    def cancel_search(self):
+        """Stop the running AI/hint search and mark its result as stale"""
+        self.search_id += 1
+        analysis = self.current_search
+        if analysis:
+            analysis.stop()
+    
+    def analyse(self, board, limit, engine=None, key=None):
+        """Analyse a position, reusing cached results for repeated positions"""
+        if key is None:
+            key = chess.polyglot.zobrist_hash(board)
+        
+        entry = self.cached_analysis(key, limit)
+        if entry:
+            return entry
+        
+        # The main engine is only used by the worker thread and pool engines
+        # by one scan at a time, so neither needs a lock
+        result = (engine or self.engine).analyse(board, limit)
+        return self.store_analysis(key, limit, result)
+    
+    def cached_analysis(self, key, limit):
+        """Return the cached analysis of a position if it satisfies the limit"""
+        # A cached search counts if it was at least as long or as deep
+        with self.cache_lock:
+            entry = self.analysis_cache.get(key)
+            if entry:
+                self.analysis_cache.move_to_end(key)
+        if entry and entry['time'] >= (limit.time or 0) and entry['depth'] >= (limit.depth or 0):
+            return entry
+        return None
+    
+    def store_analysis(self, key, limit, info):
+        """Cache an engine result, keeping an existing entry that is better on both counts"""
+        entry = {
+            'time': limit.time or 0,
+            'depth': info.get('depth', 0),
+            'score': info['score'],
+            'pv': info.get('pv', [])
+        }
+        with self.cache_lock:
+            old = self.analysis_cache.get(key)
+            if old and old['time'] >= entry['time'] and old['depth'] >= entry['depth']:
+                return old
+            self.analysis_cache[key] = entry
+            if len(self.analysis_cache) > ANALYSIS_CACHE_SIZE:
+                # Evict the least recently used position
+                self.analysis_cache.popitem(last=False)
+        return entry
+    
     # =========================================================================
     # SECTION 6: UI CREATION
     # =========================================================================
@@ -221,6 +621,15 @@ class Chessy:
         )
         self.canvas.pack(pady=(0, 10))
         self.canvas.bind("<Button-1>", self.on_click)
+        self.square_items = []
+        
+        # Fonts shared by every canvas text item
+        self.piece_font = tkfont.Font(root=self.root, family="Arial", size=48)
+        self.coord_font = tkfont.Font(root=self.root, family="Arial", size=8)
+        
+        # Named fonts for widget text, so Tk resolves each description once
+        self.body_font = tkfont.Font(root=self.root, family="Arial", size=10)
+        self.bold_font = tkfont.Font(root=self.root, family="Arial", size=10, weight="bold")
         
         # Status label
         self.status_label = tk.Label(
@@ -228,21 +637,19 @@ class Chessy:
             font=("Arial", 11), bg=theme['bg'], fg="#333333"
         )
         self.status_label.pack(fill=tk.X, pady=(0, 10))
+        self.status_text = None
         
         # Control buttons
         btn_frame = tk.Frame(left, bg=theme['bg'])
         btn_frame.pack(fill=tk.X)
-        tk.Button(btn_frame, text="New Game", command=self.new_game, width=14).pack(side=tk.LEFT, padx=2)
-        tk.Button(btn_frame, text="Undo", command=self.undo_move, width=14).pack(side=tk.LEFT, padx=2)
-        tk.Button(btn_frame, text="Hint", command=self.toggle_hint, width=14).pack(side=tk.LEFT, padx=2)
-        tk.Button(btn_frame, text="Flip Board", command=self.flip_board, width=14).pack(side=tk.LEFT, padx=2)
-        
-        # Analysis buttons
-        analysis_frame = tk.Frame(left, bg=theme['bg'])
-        analysis_frame.pack(fill=tk.X, pady=(5, 0))
-        tk.Button(analysis_frame, text="Analyze", command=self.analyze_position, width=14).pack(side=tk.LEFT, padx=2)
-        tk.Button(analysis_frame, text="Review Game", command=self.open_game_review, width=14).pack(side=tk.LEFT, padx=2)
-        tk.Button(analysis_frame, text="Find Blunders", command=self.find_blunders, width=14).pack(side=tk.LEFT, padx=2)
+        buttons = self.make_button_row(btn_frame, 14, CONTROL_BUTTONS)
+        # Deferred rows are held at this height so the layout doesn't shift
+        row_height = buttons[0].winfo_reqheight()
+        
+        # Analysis buttons, filled in after the first paint
+        self.analysis_frame = tk.Frame(left, bg=theme['bg'], height=row_height)
+        self.analysis_frame.pack_propagate(False)
+        self.analysis_frame.pack(fill=tk.X, pady=(5, 0))
         
         # RIGHT SIDE: Info panel
         right = tk.Frame(main, bg=theme['bg'])
@@ -253,15 +660,16 @@ class Chessy:
         # Move list
         move_frame = tk.Frame(right, bg=theme['bg'])
         move_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
-        tk.Label(move_frame, text="Moves:", font=("Arial", 10), bg=theme['bg']).pack(anchor="w")
+        tk.Label(move_frame, text="Moves:", font=self.body_font, bg=theme['bg']).pack(anchor="w")
         self.move_list_text = scrolledtext.ScrolledText(
             move_frame, width=30, height=15, font=("Courier", 9), bg="#FFFFFF"
         )
         self.move_list_text.pack(fill=tk.BOTH, expand=True)
         self.move_list_text.config(state=tk.DISABLED)
+        self.moves_shown = 0
         
         # Settings panel
-        settings = tk.LabelFrame(right, text="Settings", font=("Arial", 10, "bold"), bg=theme['bg'])
+        settings = tk.LabelFrame(right, text="Settings", font=self.bold_font, bg=theme['bg'])
         settings.pack(fill=tk.X, pady=(0, 10))
         
         # Player color
@@ -279,8 +687,7 @@ class Chessy:
         diff_frame.pack(fill=tk.X, padx=5, pady=5)
         tk.Label(diff_frame, text="AI Speed (sec):", bg=theme['bg']).pack(side=tk.LEFT)
         self.difficulty_var = tk.StringVar(value=str(self.ai_difficulty))
-        tk.Spinbox(diff_frame, from_=0.1, to=10.0, increment=0.5,
-                  textvariable=self.difficulty_var, width=8).pack(side=tk.LEFT, padx=10)
+        tk.Spinbox(diff_frame, textvariable=self.difficulty_var, **AI_SPEED_SPINBOX).pack(side=tk.LEFT, padx=10)
         
         # Theme selector
         theme_frame = tk.Frame(settings, bg=theme['bg'])
@@ -292,24 +699,46 @@ class Chessy:
         theme_menu.pack(side=tk.LEFT, padx=10)
         theme_menu.bind("<<ComboboxSelected>>", lambda e: self.on_theme_change())
         
-        # Action buttons
-        action_frame = tk.Frame(settings, bg=theme['bg'])
-        action_frame.pack(fill=tk.X, padx=5, pady=5)
-        tk.Button(action_frame, text="Save PGN", command=self.save_game, width=12).pack(side=tk.LEFT, padx=2)
-        tk.Button(action_frame, text="Load PGN", command=self.load_game, width=12).pack(side=tk.LEFT, padx=2)
-        tk.Button(action_frame, text="Accounts", command=self.open_accounts, width=12).pack(side=tk.LEFT, padx=2)
+        # Action buttons, filled in after the first paint
+        self.action_frame = tk.Frame(settings, bg=theme['bg'], height=row_height)
+        self.action_frame.pack_propagate(False)
+        self.action_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        self.root.after(300, self.create_analysis_buttons)
+        self.root.after(500, self.create_action_buttons)
+    
+    def create_analysis_buttons(self):
+        """Add the analysis buttons under the board"""
+        self.make_button_row(self.analysis_frame, 14, ANALYSIS_BUTTONS)
+    
+    def create_action_buttons(self):
+        """Add the save, load and accounts buttons to the settings panel"""
+        self.make_button_row(self.action_frame, 12, ACTION_BUTTONS)
+    
+    def make_button_row(self, frame, width, buttons):
+        """Pack a left-aligned row of (text, method name) buttons into frame, returning them"""
+        Button = tk.Button
+        row = []
+        for text, method in buttons:
+            button = Button(frame, text=text, command=getattr(self, method), width=width)
+            button.pack(side=tk.LEFT, padx=2)
+            row.append(button)
+        return row
     
     # =========================================================================
     # SECTION 7: BOARD DRAWING
     # =========================================================================
     
-    def draw_board(self):
-        """Draw chess board with pieces"""
-        if not self.canvas:
-            return
-        
-        self.canvas.delete("all")
-        theme = THEMES[self.current_theme]
+    def create_board_items(self):
+        """Create the persistent square and coordinate items on the canvas"""
+        # Items are indexed by screen cell (rank * 8 + file), not by square
+        self.square_items = [None] * 64
+        self.piece_items = [None] * 64
+        self.square_state = [None] * 64
+        self.coord_color = None
+        self.rank_labels = []
+        self.file_labels = []
+        self.coords_flipped = None
         
         for rank in range(8):
             for file in range(8):
@@ -318,48 +747,105 @@ class Chessy:
                 x2 = x1 + SQUARE_SIZE
                 y2 = y1 + SQUARE_SIZE
                 
-                # Calculate square index
-                square_idx = 8 * (7 - rank) + file
-                
-                # Determine color
-                is_light = (rank + file) % 2 == 0
-                color = theme['light'] if is_light else theme['dark']
+                self.square_items[rank * 8 + file] = self.canvas.create_rectangle(
+                    x1, y1, x2, y2, outline="", tags="square"
+                )
                 
-                # Highlight selected square
-                if self.selected_square == square_idx:
-                    color = theme['select']
-                # Highlight legal moves
-                elif square_idx in self.legal_moves_list:
-                    color = theme['highlight']
-                # Highlight last move
-                elif self.last_move and (square_idx == self.last_move.from_square or 
-                                        square_idx == self.last_move.to_square):
-                    color = theme['last_move']
-                # Highlight hint
-                elif self.show_hint and self.hint_move and (square_idx == self.hint_move.from_square or
-                                                            square_idx == self.hint_move.to_square):
-                    color = theme['hint']
-                
-                # Draw square
-                self.canvas.create_rectangle(x1, y1, x2, y2, fill=color, outline="")
-                
-                # Draw piece
-                piece = self.board.piece_at(square_idx)
-                if piece:
-                    symbol = PIECES.get(str(piece), str(piece))
-                    piece_color = theme['white_piece'] if piece.color else theme['black_piece']
-                    self.canvas.create_text((x1+x2)/2, (y1+y2)/2, text=symbol,
-                                           font=("Arial", 48), fill=piece_color)
-                
-                # Draw coordinates
+                # Coordinates, text is filled in by draw_board
                 if file == 0:
-                    rank_text = str(8 - rank)
-                    self.canvas.create_text(x1+2, y1+2, text=rank_text, font=("Arial", 8),
-                                           fill=theme['coord'], anchor="nw")
+                    self.rank_labels.append(self.canvas.create_text(
+                        x1+2, y1+2, font=self.coord_font, anchor="nw", tags="coord"))
                 if rank == 7:
-                    file_text = chr(97 + file)
-                    self.canvas.create_text(x2-2, y2-2, text=file_text, font=("Arial", 8),
-                                           fill=theme['coord'], anchor="se")
+                    self.file_labels.append(self.canvas.create_text(
+                        x2-2, y2-2, font=self.coord_font, anchor="se", tags="coord"))
+    
+    def draw_board(self):
+        """Draw chess board with pieces"""
+        if not self.canvas:
+            return
+        
+        # Canvas items persist; only squares whose state changed are touched
+        if not self.square_items:
+            self.create_board_items()
+        canvas = self.canvas
+        piece_map = self.board.piece_map()
+        pieces_added = False
+        
+        # Bind everything the 64-square loop reads to locals
+        (light, dark, select_color, highlight_color, last_move_color, hint_color,
+         white_pc, black_pc, coord_color) = THEME_COLORS[self.current_theme]
+        selected = self.selected_square
+        legal_targets = self.legal_moves_list
+        last_move = self.last_move
+        last_squares = (last_move.from_square, last_move.to_square) if last_move else ()
+        hint_move = self.hint_move if self.show_hint else None
+        hint_squares = (hint_move.from_square, hint_move.to_square) if hint_move else ()
+        square_state = self.square_state
+        flipped = self.board_flipped
+        
+        for cell, square_idx in enumerate(self.square_lut[flipped]):
+            rank, file = divmod(cell, 8)
+            
+            # Determine color
+            color = light if (rank + file) % 2 == 0 else dark
+            
+            # Highlight selected square
+            if selected == square_idx:
+                color = select_color
+            # Highlight legal moves
+            elif square_idx in legal_targets:
+                color = highlight_color
+            # Highlight last move
+            elif square_idx in last_squares:
+                color = last_move_color
+            # Highlight hint
+            elif square_idx in hint_squares:
+                color = hint_color
+            
+            piece = piece_map.get(square_idx)
+            if piece:
+                piece_color = piece.color
+                state = (color, PIECE_GLYPHS[(piece_color << 3) | piece.piece_type],
+                         white_pc if piece_color else black_pc)
+            else:
+                state = (color, None, None)
+            
+            old_state = square_state[cell]
+            if state == old_state:
+                continue
+            square_state[cell] = state
+            
+            # Square color
+            if old_state is None or old_state[0] != color:
+                canvas.itemconfigure(self.square_items[cell], fill=color)
+            
+            # Piece
+            if old_state is None or old_state[1:] != state[1:]:
+                item = self.piece_items[cell]
+                if state[1] is None:
+                    if item:
+                        canvas.delete(item)
+                        self.piece_items[cell] = None
+                elif item:
+                    canvas.itemconfigure(item, text=state[1], fill=state[2])
+                else:
+                    self.piece_items[cell] = canvas.create_text(
+                        file * SQUARE_SIZE + SQUARE_SIZE/2, rank * SQUARE_SIZE + SQUARE_SIZE/2,
+                        text=state[1], font=self.piece_font, fill=state[2], tags="piece"
+                    )
+                    pieces_added = True
+        
+        if self.coords_flipped != flipped:
+            self.coords_flipped = flipped
+            for i, item in enumerate(self.rank_labels):
+                canvas.itemconfigure(item, text=str(i + 1 if flipped else 8 - i))
+            for i, item in enumerate(self.file_labels):
+                canvas.itemconfigure(item, text=chr(104 - i if flipped else 97 + i))
+        if self.coord_color != coord_color:
+            self.coord_color = coord_color
+            canvas.itemconfigure("coord", fill=self.coord_color)
+        if pieces_added:
+            canvas.tag_raise("coord")
     
     # =========================================================================
     # SECTION 8: MOUSE INPUT
@@ -369,34 +855,32 @@ class Chessy:
         """Handle board click"""
         file = event.x // SQUARE_SIZE
         rank = event.y // SQUARE_SIZE
-        square = 8 * (7 - rank) + file
-        
-        if not 0 <= square < 64:
+        if not (0 <= file < 8 and 0 <= rank < 8):
             return
+        square = self.square_lut[self.board_flipped][rank * 8 + file]
         
         if self.selected_square is None:
             # Select piece
-            piece = self.board.piece_at(square)
-            if piece and piece.color == self.board.turn:
-                self.selected_square = square
-                self.legal_moves_list = [m.to_square for m in self.board.legal_moves 
-                                        if m.from_square == square]
-                self.draw_board()
+            self.select_square(square)
         else:
             if square == self.selected_square:
                 # Deselect
                 self.selected_square = None
-                self.legal_moves_list = []
+                self.legal_moves_list = frozenset()
                 self.draw_board()
             elif square in self.legal_moves_list:
                 # Move piece
                 move = chess.Move(self.selected_square, square)
-                if move in self.board.legal_moves:
-                    self.board.push(move)
-                    self.move_history.append(move)
-                    self.last_move = move
+                piece = self.board.piece_at(self.selected_square)
+                if piece.piece_type == chess.PAWN and chess.square_rank(square) in (0, 7):
+                    move.promotion = self.ask_promotion()
+                    if move.promotion is None:
+                        return
+                if self.board.is_legal(move):
+                    self.cancel_search()
+                    self.push_move(move)
                     self.selected_square = None
-                    self.legal_moves_list = []
+                    self.legal_moves_list = frozenset()
                     self.show_hint = False
                     self.hint_move = None
                     self.update_moves()
@@ -405,55 +889,87 @@ class Chessy:
                     
                     # AI move
                     if self.board.turn != self.player_color and not self.board.is_game_over():
-                        threading.Thread(target=self.ai_move, daemon=True).start()
+                        self.start_ai_move()
             else:
                 # Select different piece
-                piece = self.board.piece_at(square)
-                if piece and piece.color == self.board.turn:
-                    self.selected_square = square
-                    self.legal_moves_list = [m.to_square for m in self.board.legal_moves
-                                            if m.from_square == square]
-                    self.draw_board()
+                self.select_square(square)
+    
+    def select_square(self, square):
+        """Select the piece on a square if it belongs to the side to move"""
+        piece = self.board.piece_at(square)
+        if piece and piece.color == self.board.turn:
+            self.selected_square = square
+            # Only generate moves originating from this square
+            self.legal_moves_list = frozenset(m.to_square for m in self.board.generate_legal_moves(
+                                              from_mask=chess.BB_SQUARES[square]))
+            self.draw_board()
     
     # =========================================================================
     # SECTION 9: AI MOVE
     # =========================================================================
     
-    def ai_move(self):
-        """Make AI move"""
-        if not self.engine or self.board.is_game_over():
-            return
+    def start_ai_move(self):
+        """Queue the AI reply to the current position"""
+        try:
+            difficulty = float(self.difficulty_var.get())
+        except ValueError:
+            difficulty = self.ai_difficulty
         
+        # The worker searches a snapshot, never the live board
+        board = self.board.copy()
+        search_id = self.search_id
         self.ai_thinking = True
         self.update_status()
-        
+        self.queue_task('ai', lambda: self.ai_move(board, difficulty, search_id))
+    
+    def ai_move(self, board, difficulty, search_id):
+        """Search for the AI move (runs on the worker thread)"""
+        move = None
         try:
-            difficulty = float(self.difficulty_var.get())
-            with self.engine_lock:
-                result = self.engine.play(self.board, chess.engine.Limit(time=difficulty))
-            
-            if result.move:
-                self.board.push(result.move)
-                self.move_history.append(result.move)
-                self.last_move = result.move
-                self.update_moves()
-                self.draw_board()
-                self.update_status()
+            if self.engine and search_id == self.search_id:
+                pv = self.search(board, chess.engine.Limit(time=difficulty)).get("pv")
+                move = pv[0] if pv else None
         except Exception as e:
             print(f"AI error: {e}")
         finally:
-            self.ai_thinking = False
+            self.ui(self.finish_ai_move, move, search_id)
+    
+    def finish_ai_move(self, move, search_id):
+        """Play the AI move unless the game changed while Stockfish was thinking"""
+        self.ai_thinking = False
+        if move and search_id == self.search_id:
+            # Any hint queued for the old position is now stale
+            self.cancel_search()
+            self.push_move(move)
+            self.show_hint = False
+            self.hint_move = None
+            self.update_moves()
+            self.draw_board()
+        self.update_status()
     
     # =========================================================================
     # SECTION 10: GAME CONTROL
     # =========================================================================
     
+    def push_move(self, move):
+        """Play a move, recording it in the history and SAN list"""
+        self.move_san.append(self.board.san(move))
+        self.board.push(move)
+        self.move_history.append(move)
+        # Hash each position once, when it is reached
+        self.position_keys.append(chess.polyglot.zobrist_hash(self.board))
+        self.last_move = move
+    
     def new_game(self):
         """Start new game"""
-        self.board = chess.Board()
+        self.cancel_search()
+        self.board.reset()
         self.move_history = []
+        self.move_san = []
+        self.position_keys = self.position_keys[:1]
+        self.moves_shown = 0
         self.selected_square = None
-        self.legal_moves_list = []
+        self.legal_moves_list = frozenset()
         self.last_move = None
         self.hint_move = None
         self.show_hint = False
@@ -463,20 +979,27 @@ class Chessy:
     
     def undo_move(self):
         """Undo last move"""
-        if not self.move_history:
+        move_stack = self.board.move_stack
+        if not move_stack:
             messagebox.showinfo("Undo", "No moves to undo!")
             return
         
+        self.cancel_search()
+        self.hint_move = None
+        self.show_hint = False
         self.board.pop()
-        self.move_history.pop()
         
         # Undo AI move too
-        if self.board.turn != self.player_color and self.move_history:
+        if self.board.turn != self.player_color and move_stack:
             self.board.pop()
-            self.move_history.pop()
+        
+        # Truncate to the board's stack so the history can never drift from it
+        del self.move_history[len(move_stack):]
+        del self.move_san[len(move_stack):]
+        del self.position_keys[len(move_stack) + 1:]
         
         self.selected_square = None
-        self.legal_moves_list = []
+        self.legal_moves_list = frozenset()
         self.last_move = None
         self.update_moves()
         self.draw_board()
@@ -488,27 +1011,51 @@ class Chessy:
             messagebox.showwarning("Hint", "Stockfish not loaded!")
             return
         
+        # The board is about to change, any hint would be for the AI's side
+        if self.ai_thinking:
+            return
+        
         self.show_hint = not self.show_hint
         
+        # Supersede any hint still being searched
+        self.cancel_search()
+        
         if self.show_hint:
-            threading.Thread(target=self.calculate_hint, daemon=True).start()
+            # A deep enough earlier search of this position answers at once
+            key = self.position_keys[-1]
+            entry = self.cached_analysis(key, chess.engine.Limit(depth=HINT_DEPTH))
+            if entry and entry['pv']:
+                self.show_hint_move(entry['pv'][0], self.search_id, entry['score'])
+                return
+            
+            board = self.board.copy()
+            search_id = self.search_id
+            self.queue_task('hint', lambda: self.calculate_hint(board, search_id, key))
         else:
             self.hint_move = None
             self.draw_board()
     
-    def calculate_hint(self):
-        """Calculate best move"""
-        if not self.engine or self.board.is_game_over() or self.ai_thinking:
+    def calculate_hint(self, board, search_id, key):
+        """Calculate best move (runs on the worker thread)"""
+        if board.is_game_over() or self.ai_thinking or search_id != self.search_id:
             return
         
         try:
-            with self.engine_lock:
-                result = self.engine.play(self.board, chess.engine.Limit(time=0.5))
-            self.hint_move = result.move
-            self.draw_board()
+            # Depth-limited, so quiet positions return well before a fixed time would
+            info = self.search(board, chess.engine.Limit(depth=HINT_DEPTH), key)
+            pv = info.get("pv")
+            self.ui(self.show_hint_move, pv[0] if pv else None, search_id, info.get("score"))
         except Exception as e:
             print(f"Hint error: {e}")
     
+    def show_hint_move(self, move, search_id, score=None):
+        """Display a finished hint if the position hasn't changed"""
+        if search_id == self.search_id:
+            self.hint_move = move
+            if score:
+                self.current_evaluation = score.white().score(mate_score=MATE_SCORE) / 100.0
+            self.draw_board()
+    
     def flip_board(self):
         """Flip board orientation"""
         self.board_flipped = not self.board_flipped
@@ -523,50 +1070,76 @@ class Chessy:
         """Handle theme change"""
         new_theme = self.theme_var.get()
         if new_theme in THEMES:
+            old_bg = THEMES[self.current_theme]['bg']
             self.current_theme = new_theme
             self.save_settings()
-            # Recreate UI with new theme
-            for widget in self.root.winfo_children():
-                widget.destroy()
-            self.create_ui()
+            # Recolor the existing widgets in place instead of rebuilding the UI
+            new_bg = THEMES[new_theme]['bg']
+            if new_bg != old_bg:
+                self.recolor_widgets(self.root, old_bg, new_bg)
             self.draw_board()
     
+    def recolor_widgets(self, widget, old_bg, new_bg):
+        """Swap the background of a widget tree from one theme to another"""
+        try:
+            if widget.cget('bg') == old_bg:
+                widget.configure(bg=new_bg)
+        except tk.TclError:
+            pass  # ttk widgets have no bg option
+        
+        for child in widget.winfo_children():
+            # Dialogs keep their own colors
+            if not isinstance(child, tk.Toplevel):
+                self.recolor_widgets(child, old_bg, new_bg)
+    
     def update_status(self):
         """Update status bar"""
-        if self.board.is_checkmate():
-            winner = "Black" if self.board.turn else "White"
-            self.status_label.config(text=f"Checkmate! {winner} wins!")
-        elif self.board.is_stalemate():
-            self.status_label.config(text="Stalemate! Draw.")
-        elif self.board.is_check():
-            color = "White" if self.board.turn else "Black"
-            self.status_label.config(text=f"Check! {color} to move.")
+        board = self.board
+        in_check = board.is_check()
+        
+        # A single legal-move probe settles both checkmate and stalemate
+        if not any(board.generate_legal_moves()):
+            if in_check:
+                winner = "Black" if board.turn else "White"
+                text = f"Checkmate! {winner} wins!"
+            else:
+                text = "Stalemate! Draw."
+        elif in_check:
+            color = "White" if board.turn else "Black"
+            text = f"Check! {color} to move."
         elif self.ai_thinking:
-            self.status_label.config(text="Stockfish thinking...")
+            text = "Stockfish thinking..."
         else:
-            color = "White" if self.board.turn else "Black"
-            self.status_label.config(text=f"{color} to move")
+            color = "White" if board.turn else "Black"
+            text = f"{color} to move"
+        
+        # Skip the Tk reconfigure when nothing changed
+        if text != self.status_text:
+            self.status_text = text
+            self.status_label.config(text=text)
     
     def update_moves(self):
         """Update move list display"""
+        total = len(self.move_san)
         self.move_list_text.config(state=tk.NORMAL)
-        self.move_list_text.delete(1.0, tk.END)
         
-        board_copy = chess.Board()
-        moves_san = []
-        for move in self.move_history:
-            moves_san.append(board_copy.san(move))
-            board_copy.push(move)
+        # Only append the new moves when the displayed list is a prefix
+        start = self.moves_shown
+        if not 0 < start <= total:
+            self.move_list_text.delete(1.0, tk.END)
+            start = 0
         
-        text = ""
-        for i, move in enumerate(moves_san):
+        parts = []
+        for i in range(start, total):
+            move = self.move_san[i]
             if i % 2 == 0:
-                text += f"{i//2 + 1}. {move} "
+                parts.append(f"{i//2 + 1}. {move} ")
             else:
-                text += f"{move}\n"
+                parts.append(f"{move}\n")
         
-        self.move_list_text.insert(tk.END, text if text else "(No moves)")
+        self.move_list_text.insert(tk.END, "".join(parts) if total else "(No moves)")
         self.move_list_text.config(state=tk.DISABLED)
+        self.moves_shown = total
     
     # =========================================================================
     # SECTION 11: PGN OPERATIONS
@@ -591,8 +1164,9 @@ class Chessy:
                 for move in self.move_history:
                     node = node.add_variation(move)
                 
-                with open(filename, 'w') as f:
-                    f.write(str(game))
+                # Stream the PGN into the file instead of building it as one string
+                with open(filename, 'w', buffering=FILE_BUFFER_SIZE) as f:
+                    game.accept(chess.pgn.FileExporter(f))
                 
                 messagebox.showinfo("Success", f"Game saved!")
             except Exception as e:
@@ -606,19 +1180,24 @@ class Chessy:
         
         if filename:
             try:
-                with open(filename, 'r') as f:
+                with open(filename, 'r', buffering=FILE_BUFFER_SIZE) as f:
                     game = chess.pgn.read_game(f)
                 
                 if game:
-                    self.board = chess.Board()
+                    self.cancel_search()
+                    self.hint_move = None
+                    self.show_hint = False
+                    self.board.reset()
                     self.move_history = []
+                    self.move_san = []
+                    self.position_keys = self.position_keys[:1]
+                    self.moves_shown = 0
+                    self.last_move = None
                     for move in game.mainline_moves():
-                        self.board.push(move)
-                        self.move_history.append(move)
+                        self.push_move(move)
                     
                     self.selected_square = None
-                    self.legal_moves_list = []
-                    self.last_move = self.move_history[-1] if self.move_history else None
+                    self.legal_moves_list = frozenset()
                     self.update_moves()
                     self.draw_board()
                     self.update_status()
@@ -634,27 +1213,76 @@ class Chessy:
         """Open accounts dialog"""
         dialog = tk.Toplevel(self.root)
         dialog.title("Accounts")
-        dialog.geometry("400x200")
+        dialog.geometry("400x330")
         
-        tk.Label(dialog, text="Lichess:", font=("Arial", 10)).pack(pady=(10, 0), padx=10, anchor="w")
-        lichess_entry = tk.Entry(dialog, font=("Arial", 10), width=40)
+        tk.Label(dialog, text="Lichess:", font=self.body_font).pack(pady=(10, 0), padx=10, anchor="w")
+        lichess_entry = tk.Entry(dialog, font=self.body_font, width=40)
         lichess_entry.pack(pady=(0, 10), padx=10)
         lichess_entry.insert(0, self.lichess_username)
         
-        tk.Label(dialog, text="Chess.com:", font=("Arial", 10)).pack(pady=(0, 0), padx=10, anchor="w")
-        chesscom_entry = tk.Entry(dialog, font=("Arial", 10), width=40)
-        chesscom_entry.pack(pady=(0, 20), padx=10)
+        tk.Label(dialog, text="Chess.com:", font=self.body_font).pack(pady=(0, 0), padx=10, anchor="w")
+        chesscom_entry = tk.Entry(dialog, font=self.body_font, width=40)
+        chesscom_entry.pack(pady=(0, 10), padx=10)
         chesscom_entry.insert(0, self.chesscom_username)
         
+        tk.Label(dialog, text="Engine threads:", font=self.body_font).pack(pady=(0, 0), padx=10, anchor="w")
+        threads_entry = tk.Entry(dialog, font=self.body_font, width=40)
+        threads_entry.pack(pady=(0, 10), padx=10)
+        threads_entry.insert(0, str(self.engine_threads))
+        
+        tk.Label(dialog, text="Engine hash (MB):", font=self.body_font).pack(pady=(0, 0), padx=10, anchor="w")
+        hash_entry = tk.Entry(dialog, font=self.body_font, width=40)
+        hash_entry.pack(pady=(0, 20), padx=10)
+        hash_entry.insert(0, str(self.engine_hash))
+        
         def save():
+            try:
+                threads = max(1, int(threads_entry.get()))
+                hash_size = max(1, int(hash_entry.get()))
+            except ValueError:
+                messagebox.showerror("Error", "Engine threads and hash must be whole numbers")
+                return
+            
             self.lichess_username = lichess_entry.get()
             self.chesscom_username = chesscom_entry.get()
+            if (threads, hash_size) != (self.engine_threads, self.engine_hash):
+                self.engine_threads = threads
+                self.engine_hash = hash_size
+                if self.engine:
+                    self.queue_task("configure", self.configure_engine)
             self.save_settings()
             messagebox.showinfo("Success", "Accounts saved!")
             dialog.destroy()
         
         tk.Button(dialog, text="Save", command=save, width=40).pack(pady=10)
     
+    def ask_promotion(self):
+        """Ask which piece to promote to, returns a piece type or None"""
+        choice = {'piece': None}
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Promotion")
+        dialog.resizable(False, False)
+        dialog.transient(self.root)
+        
+        tk.Label(dialog, text="Promote to:", font=self.body_font).pack(pady=(10, 5), padx=10)
+        frame = tk.Frame(dialog)
+        frame.pack(padx=10, pady=(0, 10))
+        
+        for piece_type in (chess.QUEEN, chess.ROOK, chess.BISHOP, chess.KNIGHT):
+            symbol = chess.Piece(piece_type, self.board.turn).symbol()
+            
+            def pick(piece_type=piece_type):
+                choice['piece'] = piece_type
+                dialog.destroy()
+            
+            tk.Button(frame, text=PIECES[symbol], font=("Arial", 24), width=2,
+                     command=pick).pack(side=tk.LEFT, padx=2)
+        
+        dialog.grab_set()
+        self.root.wait_window(dialog)
+        return choice['piece']
+    
     # =========================================================================
     # SECTION 13: GAME ANALYSIS AND REVIEW
     # =========================================================================
@@ -676,48 +1304,72 @@ class Chessy:
         info_frame = tk.Frame(review_win)
         info_frame.pack(fill=tk.X, padx=10, pady=5)
         
-        tk.Label(info_frame, text=f"Total Moves: {len(self.move_history)}", font=("Arial", 10)).pack(side=tk.LEFT, padx=10)
-        tk.Label(info_frame, text=f"Evaluation: {self.current_evaluation:+.1f}", font=("Arial", 10)).pack(side=tk.LEFT, padx=10)
+        tk.Label(info_frame, text=f"Total Moves: {len(self.move_history)}", font=self.body_font).pack(side=tk.LEFT, padx=10)
+        tk.Label(info_frame, text=f"Evaluation: {self.current_evaluation:+.1f}", font=self.body_font).pack(side=tk.LEFT, padx=10)
         
         # Move list with analysis
         frame = tk.Frame(review_win)
         frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
-        tk.Label(frame, text="Moves (click to review):", font=("Arial", 10, "bold")).pack(anchor="w")
+        tk.Label(frame, text="Moves (click to review):", font=self.bold_font).pack(anchor="w")
         
         text = scrolledtext.ScrolledText(frame, width=80, height=25, font=("Courier", 9))
         text.pack(fill=tk.BOTH, expand=True)
         
-        # Generate analysis text
-        analysis_text = self.generate_game_analysis()
+        text.insert(tk.END, "Analyzing game...\n")
+        text.config(state=tk.DISABLED)
+        
+        # Generate analysis text on an analysis engine, away from live play
+        self.submit_analysis(
+            "Game Review", self.review_game, review_win, text, list(self.move_history),
+            list(self.move_san), list(self.position_keys), self.board.copy(stack=False)
+        )
+    
+    def review_game(self, review_win, text, moves, sans, keys, final_board):
+        """Build the review text on the review engine and show it in the window"""
+        engine = None
+        if self.engine:
+            try:
+                engine = self.get_review_engine()
+            except Exception as e:
+                print(f"⚠ Could not start analysis engine: {e}")
+        analysis_text = self.generate_game_analysis(moves, sans, keys, final_board, engine)
+        self.ui(self.show_game_review, review_win, text, analysis_text)
+    
+    def show_game_review(self, review_win, text, analysis_text):
+        """Fill the review window with the finished analysis"""
+        if not review_win.winfo_exists():
+            return
+        text.config(state=tk.NORMAL)
+        text.delete(1.0, tk.END)
         text.insert(tk.END, analysis_text)
         text.config(state=tk.DISABLED)
     
-    def generate_game_analysis(self):
-        """Generate analysis of the current game"""
-        if not self.move_history:
+    def generate_game_analysis(self, moves, sans, keys, final_board, engine=None):
+        """Generate analysis of a game"""
+        if not moves:
             return "No moves to analyze."
         
         analysis = "GAME ANALYSIS\n"
         analysis += "=" * 60 + "\n\n"
         
-        board = chess.Board()
-        for i, move in enumerate(self.move_history):
+        board = self.replay_board
+        board.reset()
+        for i, move in enumerate(moves):
             move_num = i // 2 + 1
             is_white = i % 2 == 0
             
-            move_san = board.san(move)
+            move_san = sans[i]
             
             # Try to evaluate position
             eval_str = ""
             try:
-                if self.engine and i % 2 == 1:  # Analyze after each pair
-                    with self.engine_lock:
-                        result = self.engine.analyse(board, chess.engine.Limit(time=0.1))
+                if engine and i % 2 == 1:  # Analyze after each pair
+                    result = self.analyse(board, chess.engine.Limit(time=0.1), engine, keys[i])
                     if result and "score" in result:
                         score = result["score"]
                         eval_str = f" [Eval: {str(score)}]"
-            except:
+            except chess.engine.EngineError:
                 eval_str = ""
             
             color = "White" if is_white else "Black"
@@ -727,12 +1379,12 @@ class Chessy:
         
         # Game result
         analysis += "\n" + "=" * 60 + "\n"
-        if self.board.is_checkmate():
-            winner = "Black" if self.board.turn else "White"
+        if final_board.is_checkmate():
+            winner = "Black" if final_board.turn else "White"
             analysis += f"Result: {winner} wins by checkmate\n"
-        elif self.board.is_stalemate():
+        elif final_board.is_stalemate():
             analysis += "Result: Draw (Stalemate)\n"
-        elif self.board.is_insufficient_material():
+        elif final_board.is_insufficient_material():
             analysis += "Result: Draw (Insufficient Material)\n"
         else:
             analysis += "Result: Game not finished\n"
@@ -745,41 +1397,44 @@ class Chessy:
             messagebox.showwarning("Engine", "Stockfish not loaded!")
             return
         
+        board = self.board.copy()
+        key = self.position_keys[-1]
+        self.queue_task('analysis', lambda: self.run_position_analysis(board, key))
+    
+    def run_position_analysis(self, board, key):
+        """Analyse a position for the analysis window (runs on the worker thread)"""
         try:
-            with self.engine_lock:
-                result = self.engine.analyse(self.board, chess.engine.Limit(time=1.0))
+            result = self.analyse(board, chess.engine.Limit(time=1.0), key=key)
+            self.ui(self.show_position_analysis, board, result)
+        except Exception as e:
+            self.ui(messagebox.showerror, "Analysis Error", f"Error analyzing position: {e}")
+    
+    def show_position_analysis(self, board, result):
+        """Open the analysis window for a finished position analysis"""
+        if result and "score" in result:
+            score = result["score"]
+            self.current_evaluation = score.white().score(mate_score=MATE_SCORE) / 100.0
             
-            if result and "score" in result:
-                score = result["score"]
-                self.current_evaluation = float(score.relative.cp) / 100.0 if score.relative.cp else 0.0
-                
-                analysis_win = tk.Toplevel(self.root)
-                analysis_win.title("Position Analysis")
-                analysis_win.geometry("400x250")
-                
-                tk.Label(analysis_win, text="Position Evaluation", font=("Arial", 12, "bold")).pack(pady=10)
-                
-                eval_text = f"Current Evaluation: {str(score)}"
-                if score.relative.cp:
-                    eval_num = score.relative.cp / 100.0
-                    if eval_num > 0:
-                        eval_text += f"\nWhite advantage: {eval_num:+.1f}"
-                    else:
-                        eval_text += f"\nBlack advantage: {-eval_num:+.1f}"
-                
-                tk.Label(analysis_win, text=eval_text, font=("Arial", 11)).pack(pady=10)
+            analysis_win = tk.Toplevel(self.root)
+            analysis_win.title("Position Analysis")
+            analysis_win.geometry("400x250")
+            
+            tk.Label(analysis_win, text="Position Evaluation", font=("Arial", 12, "bold")).pack(pady=10)
+            
+            eval_text = f"Current Evaluation: {str(score)}"
+            if score.relative.cp:
+                eval_num = score.relative.cp / 100.0
+                if eval_num > 0:
+                    eval_text += f"\nWhite advantage: {eval_num:+.1f}"
+                else:
+                    eval_text += f"\nBlack advantage: {-eval_num:+.1f}"
+            
+            tk.Label(analysis_win, text=eval_text, font=("Arial", 11)).pack(pady=10)
+            
+            if result["pv"]:
+                pv_text = "Best continuation:\n" + board.variation_san(result["pv"][:5])
                 
-                if "pv" in result:
-                    pv_moves = result["pv"]
-                    pv_text = "Best continuation:\n"
-                    board_copy = self.board.copy()
-                    for move in pv_moves[:5]:
-                        pv_text += f"{board_copy.san(move)} "
-                        board_copy.push(move)
-                    
-                    tk.Label(analysis_win, text=pv_text, font=("Courier", 9), wraplength=350).pack(pady=10)
-        except Exception as e:
-            messagebox.showerror("Analysis Error", f"Error analyzing position: {e}")
+                tk.Label(analysis_win, text=pv_text, font=("Courier", 9), wraplength=350).pack(pady=10)
     
     def find_blunders(self):
         """Analyze game to find blunders"""
@@ -791,58 +1446,143 @@ class Chessy:
         blunder_win.title("Blunder Analysis")
         blunder_win.geometry("600x500")
         
-        tk.Label(blunder_win, text="Analyzing for blunders...", font=("Arial", 11)).pack(pady=10)
-        blunder_win.update()
+        status = tk.Label(blunder_win, text="Analyzing for blunders...", font=("Arial", 11))
+        status.pack(pady=10)
+        text = scrolledtext.ScrolledText(blunder_win, width=70, height=25, font=("Courier", 9))
+        text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        text.config(state=tk.DISABLED)
         
-        blunders = []
+        # The game can go on while the scan runs, so it works on copies
+        self.submit_analysis(
+            "Blunder Check", self.scan_blunders, blunder_win, status, text, list(self.move_history),
+            list(self.move_san), list(self.position_keys)
+        )
+    
+    def scan_blunders(self, blunder_win, status, text, moves, sans, keys):
+        """Evaluate a game on the engine pool, streaming blunders to the window"""
+        # Every distinct position of the game, each one is evaluated only once
+        positions = []
+        seen = set()
         board = chess.Board()
+        for i, move in enumerate(moves):
+            if keys[i] not in seen:
+                seen.add(keys[i])
+                positions.append((board.copy(stack=False), keys[i]))
+            board.push(move)
+        if keys[-1] not in seen:
+            positions.append((board, keys[-1]))
+        
+        try:
+            pool = self.get_engine_pool()
+        except Exception as e:
+            self.ui(self.analysis_failed, blunder_win, "Blunder Check", f"Could not start analysis engines: {e}")
+            return
+        
+        # Positions where each key occurs, to find the plies a new score completes
+        occurrences = {}
+        for p, key in enumerate(keys):
+            occurrences.setdefault(key, []).append(p)
+        scores = {}
+        blunders = []
+        lock = threading.Lock()
+        
+        def on_score(key, score):
+            found = []
+            with lock:
+                scores[key] = score
+                done = len(scores)
+                # The evaluation after ply i is the one before ply i + 1
+                for p in occurrences[key]:
+                    for i in (p - 1, p):
+                        if 0 <= i < len(sans) and keys[i] in scores and keys[i + 1] in scores:
+                            blunder = self.check_blunder(i, scores[keys[i]], scores[keys[i + 1]], sans[i])
+                            if blunder:
+                                found.append(blunder)
+                                # Heap ordered worst first, ply breaks ties
+                                heapq.heappush(blunders, (-blunder["loss"], i, blunder))
+            self.ui(self.show_blunder_progress, blunder_win, status, text, done, len(positions), found)
+        
+        # Each engine walks a contiguous stretch of the game in order, so
+        # its hash table still holds the subtrees of the previous position
+        size = -(-len(positions) // len(pool))
+        chunks = [positions[j:j + size] for j in range(0, len(positions), size)]
         
-        for i, move in enumerate(self.move_history):
+        try:
+            with ThreadPoolExecutor(max_workers=len(pool)) as executor:
+                list(executor.map(self.evaluate_positions, pool, chunks, [on_score] * len(chunks)))
+        except (OSError, chess.engine.EngineError) as e:
+            self.ui(self.analysis_failed, blunder_win, "Blunder Check", f"Could not restart analysis engine: {e}")
+            return
+        
+        self.ui(self.finish_blunder_scan, blunder_win, status, text, blunders)
+    
+    def check_blunder(self, i, score_before, score_after, san):
+        """Compare White's scores around ply i, returns a blunder dict or None"""
+        if score_before is None or score_after is None:
+            return None
+        
+        # Scores are from White's point of view, turn them into the mover's loss
+        loss_cp = score_before - score_after
+        if i % 2:
+            loss_cp = -loss_cp
+        
+        if loss_cp > CP_BLUNDER:
+            return {
+                "move": san,
+                "color": "White" if i % 2 == 0 else "Black",
+                "num": i // 2 + 1,
+                "loss": loss_cp
+            }
+        return None
+    
+    def evaluate_positions(self, engine, positions, on_score):
+        """Evaluate consecutive positions on one pooled engine, reporting White's scores"""
+        for board, key in positions:
+            if self.closing:
+                return
             try:
-                # Evaluate before move
-                with self.engine_lock:
-                    result_before = self.engine.analyse(board, chess.engine.Limit(time=0.2))
-                
-                board.push(move)
-                
-                # Evaluate after move
-                with self.engine_lock:
-                    result_after = self.engine.analyse(board, chess.engine.Limit(time=0.2))
-                
-                if result_before and result_after and "score" in result_before and "score" in result_after:
-                    score_before = result_before["score"].relative.cp or 0
-                    score_after = result_after["score"].relative.cp or 0
-                    
-                    eval_loss = (score_before - score_after) / 100.0
-                    
-                    if eval_loss > 0.5:  # Significant loss
-                        move_num = i // 2 + 1
-                        color = "White" if i % 2 == 0 else "Black"
-                        blunders.append({
-                            "move": board.san(move),
-                            "color": color,
-                            "num": move_num,
-                            "loss": eval_loss
-                        })
-            except:
-                pass
-        
-        # Display results
-        blunder_win.winfo_children()[0].destroy()
+                result = self.analyse(board, chess.engine.Limit(depth=BLUNDER_DEPTH), engine, key)
+                score = result["score"].white().score(mate_score=MATE_SCORE)
+            except chess.engine.EngineTerminatedError as e:
+                if self.closing:
+                    return
+                print(f"⚠ Analysis engine stopped, restarting: {e}")
+                score = None
+                engine = self.restart_pool_engine(engine)
+            except chess.engine.EngineError as e:
+                print(f"⚠ Analysis error: {e}")
+                score = None
+            on_score(key, score)
+    
+    def show_blunder_progress(self, blunder_win, status, text, done, total, blunders):
+        """Update the blunder window as scores come in"""
+        if not blunder_win.winfo_exists():
+            return
+        status.config(text=f"Analyzing for blunders... {done}/{total} positions")
+        if blunders:
+            text.config(state=tk.NORMAL)
+            for blunder in blunders:
+                text.insert(tk.END, f"Move {blunder['num']}. {blunder['move']} ({blunder['color']})\n")
+                text.insert(tk.END, f"   Evaluation loss: -{min(blunder['loss'], MATE_SCORE) / 100:.1f}\n\n")
+            text.see(tk.END)
+            text.config(state=tk.DISABLED)
+    
+    def finish_blunder_scan(self, blunder_win, status, text, blunders):
+        """Show the final blunder list, worst first"""
+        if not blunder_win.winfo_exists():
+            return
         
         if blunders:
-            text = scrolledtext.ScrolledText(blunder_win, width=70, height=25, font=("Courier", 9))
-            text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-            
-            text.insert(tk.END, f"Found {len(blunders)} questionable move(s):\n\n")
-            for blunder in sorted(blunders, key=lambda x: x["loss"], reverse=True):
+            status.config(text=f"Found {len(blunders)} questionable move(s):")
+            text.config(state=tk.NORMAL)
+            text.delete(1.0, tk.END)
+            for _, _, blunder in heapq.nsmallest(len(blunders), blunders):
                 text.insert(tk.END, f"Move {blunder['num']}. {blunder['move']} ({blunder['color']})\n")
-                text.insert(tk.END, f"   Evaluation loss: -{blunder['loss']:.1f}\n\n")
-            
+                text.insert(tk.END, f"   Evaluation loss: -{min(blunder['loss'], MATE_SCORE) / 100:.1f}\n\n")
             text.config(state=tk.DISABLED)
         else:
-            tk.Label(blunder_win, text="No significant blunders found!", font=("Arial", 11)).pack(pady=20)
-
+            status.config(text="No significant blunders found!")
+            text.destroy()
 
 # =============================================================================
 # SECTION 13: MAIN ENTRY POINT
@@ -851,15 +1591,24 @@ class Chessy:
 def main():
     """Start Chessy application"""
     root = tk.Tk()
-    app = Chessy(root)
-    root.mainloop()
-    
-    # Cleanup
-    if app.engine:
+    with ExitStack() as stack:
+        # Put the original Ctrl+C handling back once shutdown has finished
+        stack.callback(signal.signal, signal.SIGINT, signal.getsignal(signal.SIGINT))
+        app = Chessy(root)
+        stack.callback(app.close)
+        
+        # Ctrl+C closes the window so the engines are still shut down. Tk only
+        # returns to Python on events, so wake it regularly to run the handler
+        signal.signal(signal.SIGINT, lambda *_: root.destroy())
+        def wake():
+            root.after(250, wake)
+        wake()
+        
         try:
-            app.engine.quit()
-        except:
-            pass
+            root.mainloop()
+        finally:
+            # The root is gone, a second Ctrl+C must not interrupt the shutdown
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
 
 
 if __name__ == "__main__":
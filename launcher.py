@@ -7,22 +7,58 @@ Automatically detects environment and runs the app
 import sys
 import os
 import subprocess
+from importlib import import_module
+
+def cached_import(module_name, attr):
+    """Return an attribute of a module, importing it only if not yet loaded."""
+    mods = sys.modules
+    module = mods.get(module_name)
+    if module is None or (
+        getattr(module, "__spec__", None) and getattr(module.__spec__, "_initializing", False)
+    ):
+        import_module(module_name)
+        module = mods[module_name]
+    return getattr(module, attr)
 
 def main():
-    # Get the directory where this script is located
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    # Change to the script directory
-    os.chdir(script_dir)
+    # Make chessy importable from any working directory, it resolves its
+    # own data files relative to itself
+    here = os.path.dirname(__file__)
+    if here not in sys.path:
+        sys.path.insert(0, here)
     
     # Import and run the app
     try:
-        from chessy import ChessAnalyser
-        import tkinter as tk
+        Tk = cached_import("tkinter", "Tk")
+        Label = cached_import("tkinter", "Label")
+        
+        # Show the window first, then import chessy and its dependencies
+        root = Tk()
+        root.title("Chess Analyser")
+        loading = Label(root, text="Loading…")
+        loading.pack()
+        root.update_idletasks()
+        
+        apps = []
+        errors = []
+        
+        def boot():
+            try:
+                Chessy = cached_import("chessy", "Chessy")
+                loading.destroy()
+                apps.append(Chessy(root))
+            except Exception as e:
+                errors.append(e)
+                root.destroy()
         
-        root = tk.Tk()
-        app = ChessAnalyser(root)
-        root.mainloop()
+        root.after_idle(boot)
+        try:
+            root.mainloop()
+        finally:
+            for app in apps:
+                app.close()
+        if errors:
+            raise errors[0]
     except ImportError as e:
         print(f"Error importing required modules: {e}")
         print("Please ensure all dependencies are installed:")
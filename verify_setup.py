@@ -6,94 +6,148 @@ Tests all components and reports status
 
 import os
 import sys
+import shutil
 import importlib.util
+from functools import lru_cache
+from importlib.metadata import distributions
+from concurrent.futures import ThreadPoolExecutor
+
+PROJECT_FILES = (
+    ("chessy.py", "GUI Application"),
+    ("main.py", "CLI Application"),
+    ("requirements.txt", "Dependencies"),
+    ("chess_settings.json", "Settings"),
+    (".venv", "Virtual Environment"),
+    ("stockfish", "Stockfish Directory"),
+)
+
+REQUIRED_MODULES = (
+    ("tkinter", None),
+    ("chess", "python-chess"),
+    ("requests", None),
+)
+
+# Places Stockfish is usually unpacked or installed on this platform
+if sys.platform.startswith("win"):
+    STOCKFISH_PATHS = (
+        r"stockfish\stockfish-windows-x86-64-avx2.exe",
+        r"stockfish\stockfish.exe",
+        "stockfish.exe",
+    )
+else:
+    STOCKFISH_PATHS = (
+        "stockfish",
+        "/usr/bin/stockfish",
+        "/usr/local/bin/stockfish",
+    )
 
 def check_file(filepath, description):
-    """Check if a file exists."""
+    """Check if a file exists, returning its status line."""
     exists = os.path.exists(filepath)
     status = "✓" if exists else "✗"
-    print(f"{status} {description}: {filepath}")
-    return exists
+    return exists, f"{status} {description}: {filepath}"
+
+@lru_cache(maxsize=None)
+def installed_versions():
+    """Map installed distribution names to versions, scanning site-packages once."""
+    versions = {}
+    for dist in distributions():
+        name = dist.metadata["Name"]
+        if name:
+            versions[name.lower().replace("_", "-")] = dist.version
+    return versions
 
 def check_module(module_name, package_name=None):
-    """Check if a Python module is installed."""
+    """Check if a Python module is installed, returning its status line."""
     pkg = package_name or module_name
-    try:
-        spec = importlib.util.find_spec(module_name)
-        print(f"✓ {pkg} is installed")
-        return True
-    except (ImportError, ModuleNotFoundError):
-        print(f"✗ {pkg} is NOT installed")
-        return False
+    if module_name in sys.modules or importlib.util.find_spec(module_name) is not None:
+        versions = installed_versions()
+        # The module's own distribution comes first, python-chess 1.999 is an
+        # empty shim that only depends on chess
+        version = versions.get(module_name.lower()) or versions.get(pkg.lower())
+        if version:
+            return True, f"✓ {pkg} {version} is installed"
+        return True, f"✓ {pkg} is installed"
+    return False, f"✗ {pkg} is NOT installed"
 
 def check_stockfish():
-    """Check if Stockfish is available."""
+    """Check if Stockfish is available, returning its status line."""
     import subprocess
     
-    possible_paths = [
-        "stockfish\\stockfish-windows-x86-64-avx2.exe",
-        "stockfish\\stockfish.exe",
-        "stockfish.exe",
-        "stockfish",
-        "/usr/bin/stockfish",
-        "/usr/local/bin/stockfish",
-    ]
+    found = None
+    for path in STOCKFISH_PATHS:
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            found = path
+            break
+    found = found or shutil.which("stockfish")
     
-    for path in possible_paths:
+    if found:
         try:
-            result = subprocess.run([path, "--version"], capture_output=True, timeout=2)
+            result = subprocess.run([found, "--version"], capture_output=True, timeout=2)
             if result.returncode == 0:
-                print(f"✓ Stockfish found: {path}")
-                return True
-        except:
+                return True, f"✓ Stockfish found: {found}"
+        except (OSError, subprocess.TimeoutExpired):
             pass
     
-    print("✗ Stockfish NOT found - Download from https://stockfishchess.org/download/")
-    return False
+    return False, "✗ Stockfish NOT found - Download from https://stockfishchess.org/download/"
 
 def main():
-    print("=" * 60)
-    print("CHESS ANALYSER - VERIFICATION REPORT")
-    print("=" * 60)
+    # Collect the report and write it in one go
+    out = []
+    say = out.append
+    
+    say("=" * 60)
+    say("CHESS ANALYSER - VERIFICATION REPORT")
+    say("=" * 60)
     
     all_ok = True
     
-    print("\n📁 PROJECT FILES:")
-    print("-" * 60)
-    all_ok &= check_file("chessy.py", "GUI Application")
-    all_ok &= check_file("main.py", "CLI Application")
-    all_ok &= check_file("requirements.txt", "Dependencies")
-    all_ok &= check_file("chess_settings.json", "Settings")
-    all_ok &= check_file(".venv", "Virtual Environment")
-    all_ok &= check_file("stockfish", "Stockfish Directory")
+    # The checks are independent, run them together so the Stockfish probe
+    # overlaps the file and module lookups. Results are reported in order.
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        stockfish_check = pool.submit(check_stockfish)
+        file_checks = [pool.submit(check_file, path, description)
+                       for path, description in PROJECT_FILES]
+        module_checks = [pool.submit(check_module, module_name, package_name)
+                         for module_name, package_name in REQUIRED_MODULES]
+    
+    say("\n📁 PROJECT FILES:")
+    say("-" * 60)
+    for check in file_checks:
+        ok, line = check.result()
+        all_ok &= ok
+        say(line)
     
-    print("\n📦 PYTHON PACKAGES:")
-    print("-" * 60)
-    all_ok &= check_module("tkinter")
-    all_ok &= check_module("chess", "python-chess")
-    all_ok &= check_module("requests")
-    all_ok &= check_module("json")
-    all_ok &= check_module("threading")
+    say("\n📦 PYTHON PACKAGES:")
+    say("-" * 60)
+    for check in module_checks:
+        ok, line = check.result()
+        all_ok &= ok
+        say(line)
     
-    print("\n🔧 EXTERNAL TOOLS:")
-    print("-" * 60)
-    stockfish_ok = check_stockfish()
+    say("\n🔧 EXTERNAL TOOLS:")
+    say("-" * 60)
+    stockfish_ok, line = stockfish_check.result()
+    say(line)
     
-    print("\n" + "=" * 60)
+    say("\n" + "=" * 60)
     if all_ok and stockfish_ok:
-        print("✅ ALL CHECKS PASSED - App is ready to use!")
-        print("\nRun: python chessy.py")
-        return 0
+        say("✅ ALL CHECKS PASSED - App is ready to use!")
+        say("\nRun: python chessy.py")
+        code = 0
     elif all_ok:
-        print("⚠️  MOST CHECKS PASSED - Missing Stockfish")
-        print("\nYou can still play, but AI opponent won't be available.")
-        print("Download from: https://stockfishchess.org/download/")
-        print("\nRun: python chessy.py")
-        return 0
+        say("⚠️  MOST CHECKS PASSED - Missing Stockfish")
+        say("\nYou can still play, but AI opponent won't be available.")
+        say("Download from: https://stockfishchess.org/download/")
+        say("\nRun: python chessy.py")
+        code = 0
     else:
-        print("❌ SOME CHECKS FAILED")
-        print("\nRun: pip install -r requirements.txt")
-        return 1
+        say("❌ SOME CHECKS FAILED")
+        say("\nRun: pip install -r requirements.txt")
+        code = 1
+    
+    sys.stdout.write("\n".join(out) + "\n")
+    return code
 
 if __name__ == "__main__":
     sys.exit(main())